@@ -1,70 +1,139 @@
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+from pyarrow import csv as pacsv
+from pyarrow import dataset as ds
+from pyarrow import fs as pafs
+from pyarrow import parquet as pq
+from pathlib import Path
 
-def calculate_physics_impact():
-    print("⚡ Converting Grid Physics to Financial Impact...")
+from ingest_static import cached_source_key, load_wind_ids, source_key
 
-    # 1. Load the Raw Data
-    try:
-        df = pd.read_csv("data/raw/raw_acceptances.csv")
-        print(f"   📊 Loaded {len(df)} raw rows.")
-    except FileNotFoundError:
-        print("❌ Data file missing. Run ingest script first.")
-        return
+# Copy-on-Write makes the filtered frames below cheap views instead of full
+# copies (always on from pandas 3.0, opt-in on 2.x)
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.options.mode.copy_on_write = True
+
+RAW_DIR = Path(__file__).resolve().parent.parent / "data" / "raw"
+CSV_PATH = RAW_DIR / "raw_acceptances.csv"
+
+# The only columns the physics and the dashboard ever touch
+ACCEPTANCE_COLUMNS = ['timeFrom', 'timeTo', 'levelFrom', 'levelTo', 'bmUnitId']
+
+# Arrow converts the ISO timestamps while parsing, so no pd.to_datetime pass
+ACCEPTANCE_TYPES = {
+    'timeFrom': pa.timestamp('s', tz='UTC'),
+    'timeTo': pa.timestamp('s', tz='UTC'),
+    # MW set-points: float32 is plenty and halves the bytes every pass touches
+    'levelFrom': pa.float32(),
+    'levelTo': pa.float32(),
+    # A few hundred IDs repeated ~57k times: dictionary-encoded, so pandas
+    # gets a categorical (int codes) with no string work
+    'bmUnitId': pa.dictionary(pa.int32(), pa.string()),
+}
+
+def read_acceptances_csv(csv_path):
+    # PyArrow's reader is multithreaded and much faster than pd.read_csv
+    # Only the columns we use are converted at all
+    convert_options = pacsv.ConvertOptions(column_types=ACCEPTANCE_TYPES, include_columns=ACCEPTANCE_COLUMNS)
+    return pacsv.read_csv(csv_path, convert_options=convert_options)
+
+def write_parquet_copy(table, csv_path, parquet_path):
+    # Tagged with the version of the CSV it was built from, like the register copy
+    metadata = {**(table.schema.metadata or {}), b'source': source_key(csv_path)}
+    pq.write_table(table.replace_schema_metadata(metadata), parquet_path, compression='zstd')
+
+def convert_to_parquet(csv_path, parquet_path):
+    write_parquet_copy(read_acceptances_csv(csv_path), csv_path, parquet_path)
+
+def load_acceptances(csv_path=CSV_PATH, wind_ids=None):
+    # The CSV is only parsed once: a typed Parquet copy sits next to it and is
+    # rebuilt whenever the CSV changes (e.g. after a fresh ingest run).
+    csv_path = Path(csv_path)
+    parquet_path = csv_path.with_suffix('.parquet')
+    if csv_path.exists() and cached_source_key(parquet_path) != source_key(csv_path):
+        table = read_acceptances_csv(csv_path)
+        dataset = ds.dataset(table)
+        try:
+            write_parquet_copy(table, csv_path, parquet_path)
+        except OSError:
+            pass  # Read-only deployments just scan the parsed CSV in memory
+    else:
+        # Memory-mapped: saves the read() copy into Arrow buffers; the zstd pages
+        # are still decompressed into fresh memory
+        dataset = ds.dataset(parquet_path, format='parquet', filesystem=pafs.LocalFileSystem(use_mmap=True))
+
+    # Any collection of IDs, or load_wind_id_array() as-is
+    if wind_ids is not None and not isinstance(wind_ids, pa.Array):
+        wind_ids = pa.array(list(wind_ids), pa.string())
+
+    # Filter for Wind inside the scan
+    row_filter = ds.field('bmUnitId').isin(wind_ids) if wind_ids is not None else None
+    df = dataset.to_table(columns=ACCEPTANCE_COLUMNS, filter=row_filter).to_pandas()
+
+    if wind_ids is not None:
+        df['bmUnitId'] = df['bmUnitId'].cat.remove_unused_categories()
+    return df
 
-    # 2. Clean Time & Physics
-    df['timeFrom'] = pd.to_datetime(df['timeFrom'])
-    df['timeTo'] = pd.to_datetime(df['timeTo'])
-    df['duration_hours'] = (df['timeTo'] - df['timeFrom']).dt.total_seconds() / 3600
-    df['mwh_volume'] = ((df['levelFrom'] + df['levelTo']) / 2) * df['duration_hours']
+NS_PER_HOUR = 3_600_000_000_000
 
-    # 3. FIX: Enhanced Wind Dictionary Loading
+def add_mwh_volume(df):
+    # Trapezoidal rule: average of the two MW levels x duration in hours
+    duration_ns = df['timeTo'].to_numpy('datetime64[ns]').view('i8') - df['timeFrom'].to_numpy('datetime64[ns]').view('i8')
+
+    # Hours factor in float64 first: float32 x raw nanoseconds loses precision
+    mwh_volume = df['levelFrom'].to_numpy(np.float32) + df['levelTo'].to_numpy(np.float32)
+    mwh_volume *= duration_ns * (0.5 / NS_PER_HOUR)
+    return df.assign(mwh_volume=mwh_volume)
+
+def unit_totals(df):
+    # Total |MWh| per BM unit from the category codes (missing IDs, code -1, dropped)
+    codes = df['bmUnitId'].cat.codes.to_numpy()
+    categories = df['bmUnitId'].cat.categories
+    present = codes >= 0
+    sums = np.bincount(codes[present], weights=df['mwh_volume'].to_numpy()[present], minlength=len(categories))
+    counts = np.bincount(codes[present], minlength=len(categories))
+    totals = pd.Series(np.abs(sums), index=categories.rename('bmUnitId'), name='mwh_volume')
+    return totals[counts > 0]
+
+def calculate_physics_impact():
+    print("⚡ Converting Grid Physics to Financial Impact...")
+
+    # 1. Wind Dictionary (cached: Parquet sidecar + in-process memo)
     try:
-        static_df = pd.read_excel("data/static/BMUFuelType.xlsx")
-        # Clean headers
-        static_df.columns = [c.strip() for c in static_df.columns]
-        
-        # Filter for WIND
-        wind_rows = static_df[static_df['BMRS FUEL TYPE'] == 'WIND']
-        
-        # CRITICAL FIX: Load BOTH ID columns into the set
-        # The API might use 'NESO BMU ID' or 'SETT UNIT ID'
-        id_set_1 = set(wind_rows['NESO BMU ID'].dropna().unique())
-        id_set_2 = set(wind_rows['SETT UNIT ID'].dropna().unique())
-        
-        # Combine them
-        wind_ids = id_set_1.union(id_set_2)
-        
+        # Loads BOTH 'NESO BMU ID' and 'SETT UNIT ID' for WIND units
+        wind_ids = load_wind_ids()
         print(f"   📚 Dictionary loaded: {len(wind_ids)} unique Wind IDs.")
         
     except Exception as e:
         print(f"   ⚠️ Dictionary Error: {e}. Proceeding with ALL data.")
-        wind_ids = set()
-
-    # 4. Filter for Wind
-    if wind_ids:
-        # Check if we have matches
-        # Normalize API IDs to string just in case
-        df['bmUnitId'] = df['bmUnitId'].astype(str)
-        wind_df = df[df['bmUnitId'].isin(wind_ids)].copy()
-        print(f"   ✅ Filtered from {len(df)} to {len(wind_df)} Wind Rows.")
-    else:
-        wind_df = df.copy()
+        wind_ids = None
+
+    # 2. Load the Raw Data, filtered for Wind
+    try:
+        wind_df = load_acceptances(wind_ids=wind_ids or None)
+        print(f"   ✅ Loaded {len(wind_df)} {'Wind' if wind_ids else 'raw'} rows.")
+    except FileNotFoundError:
+        print("❌ Data file missing. Run ingest script first.")
+        return
+
+    # 3. Physics (timestamps already parsed by the loader)
+    wind_df = add_mwh_volume(wind_df)
 
-    # 5. Filter for "Intervention" (Constraint)
+    # 4. Filter for "Intervention" (Constraint)
     # We look for where the grid forced a TURN DOWN.
     # Logic: Ramp Delta is Negative (LevelTo < LevelFrom) OR Volume is Negative (if provided)
     wind_df['delta'] = wind_df['levelTo'] - wind_df['levelFrom']
     
     # Assumption: Significant ramp-downs or pinned-low instructions are constraints
     # We filter for rows where the instruction is "Turn Down"
-    constraint_df = wind_df[wind_df['delta'] < 0].copy()
+    constraint_df = wind_df[wind_df['delta'] < 0]
     
     if len(constraint_df) == 0:
         print("   ⚠️ No strict 'Ramp Down' found. Using all Wind Actions as proxy.")
-        constraint_df = wind_df.copy()
+        constraint_df = wind_df
 
-    # 6. Calculate Results
+    # 5. Calculate Results
     # Total Volume of Energy Removed from the Grid
     # We use ABS because we want the magnitude of the intervention
     intervention_mwh = abs(constraint_df['mwh_volume'].sum())
@@ -80,7 +149,7 @@ def calculate_physics_impact():
     print("="*40)
     
     print("\n🏆 Top 5 Active Constraints (BM Units):")
-    print(constraint_df.groupby('bmUnitId')['mwh_volume'].sum().abs().sort_values(ascending=False).head(5))
+    print(unit_totals(constraint_df).nlargest(5))
 
 if __name__ == "__main__":
     calculate_physics_impact()
\ No newline at end of file
@@ -1,9 +1,13 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 import numpy as np
+import pyarrow as pa
+import hashlib
 from pathlib import Path
 
+from calculate_physics import add_mwh_volume, load_acceptances, unit_totals
+from ingest_static import load_wind_id_array, source_key
+
 # --- CONFIGURATION ---
 st.set_page_config(page_title="UK Wind Constraint Tracker", page_icon="⚡", layout="wide")
 
@@ -17,6 +21,16 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Rows sent to the Raw Grid Telemetry Inspector
+INSPECTOR_ROWS = 1000
+
+# Layout version of the on-disk frame cache: bump when the cached columns,
+# dtypes or derivations (ACCEPTANCE_TYPES, add_mwh_volume) change
+CACHE_FORMAT = 1
+
+# Seed for the map's position jitter (deterministic across reruns and sessions)
+MAP_JITTER_SEED = 42
+
 # --- COORDINATE DICTIONARY (Jittered) ---
 ASSET_LOCATIONS = {
     'T_HOWAO-1': {'lat': 53.80, 'lon': 1.90, 'name': 'Hornsea One A'},
@@ -34,46 +48,92 @@ ASSET_LOCATIONS = {
     'T_SHWS-1':  {'lat': 53.10, 'lon': 1.10,  'name': 'Sheringham Shoal'}
 }
 
-# --- DATA LOADING (ROBUST PATHS) ---
-@st.cache_data
-def load_data():
-    # 1. Find the project root directory
-    base_dir = Path(__file__).resolve().parent.parent
-    csv_path = base_dir / 'data' / 'raw' / 'raw_acceptances.csv'
-    excel_path = base_dir / 'data' / 'static' / 'BMUFuelType.xlsx'
+# The same table as a frame indexed by unit (float32 lat/lon), so the map is a
+# single index join instead of a row loop; built once per process
+@st.cache_resource(show_spinner=False)
+def _locations_df():
+    return (pd.DataFrame.from_dict(ASSET_LOCATIONS, orient='index')
+            .rename_axis('bmUnitId')
+            .astype({'lat': 'float32', 'lon': 'float32'}))
 
+# --- DATA LOADING (ROBUST PATHS) ---
+# 1. Find the project root directory
+BASE_DIR = Path(__file__).resolve().parent.parent
+CSV_PATH = BASE_DIR / 'data' / 'raw' / 'raw_acceptances.csv'
+EXCEL_PATH = BASE_DIR / 'data' / 'static' / 'BMUFuelType.xlsx'
+CACHE_DIR = BASE_DIR / 'data' / 'cache'
+
+def data_version():
+    # The source files' mtime_ns + size (the same key the Parquet copies are
+    # checked against), so a fresh ingest or register update reloads without
+    # restarting the app
+    return tuple(source_key(path) if path.exists() else b'' for path in (CSV_PATH, EXCEL_PATH))
+
+# Shared, not copied, between reruns: everything below only reads from it
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_data(version):
     try:
         # Check if CSV exists
-        if not csv_path.exists():
-            st.error(f"🔍 File Not Found. Searching at: {csv_path}")
+        if not CSV_PATH.exists():
+            st.error(f"🔍 File Not Found. Searching at: {CSV_PATH}")
             return pd.DataFrame()
 
-        df = pd.read_csv(csv_path)
-        
-        # Standard processing
-        df['timeFrom'] = pd.to_datetime(df['timeFrom'])
-        df['timeTo'] = pd.to_datetime(df['timeTo'])
-        df['duration_hours'] = (df['timeTo'] - df['timeFrom']).dt.total_seconds() / 3600
-        df['mwh_volume'] = ((df['levelFrom'] + df['levelTo']) / 2) * df['duration_hours']
-        
+        if not EXCEL_PATH.exists():
+            st.warning(f"⚠️ Wind Dictionary missing at {EXCEL_PATH}. Showing all assets.")
+
+        # 2. Reuse the finished frame from disk if neither source file has changed
+        key = hashlib.md5(repr((CACHE_FORMAT, version)).encode()).hexdigest()
+        cache_path = CACHE_DIR / f"wind_{key}.parquet"
+        if cache_path.exists():
+            df = pd.read_parquet(cache_path, memory_map=True)
+            # Everything downstream works off bmUnitId's category codes
+            if not isinstance(df['bmUnitId'].dtype, pd.CategoricalDtype):
+                df['bmUnitId'] = df['bmUnitId'].astype('category')
+            return df
+
         # Load the Wind Dictionary if it exists
-        if excel_path.exists():
-            static = pd.read_excel(excel_path)
-            static.columns = [c.strip() for c in static.columns]
-            wind_rows = static[static['BMRS FUEL TYPE'] == 'WIND']
-            wind_ids = set(wind_rows['NESO BMU ID'].unique()).union(set(wind_rows['SETT UNIT ID'].unique()))
-            
-            df['bmUnitId'] = df['bmUnitId'].astype(str)
-            df = df[df['bmUnitId'].isin(wind_ids)]
-        else:
-            st.warning(f"⚠️ Wind Dictionary missing at {excel_path}. Showing all assets.")
-            
+        wind_ids = load_wind_id_array() if EXCEL_PATH.exists() else None
+        df = load_acceptances(CSV_PATH, wind_ids=wind_ids)
+
+        # Standard processing
+        df = add_mwh_volume(df)
+
+        # 3. Persist for the next cold start (older keys are stale, drop them)
+        try:
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            for stale in CACHE_DIR.glob("wind_*.parquet"):
+                stale.unlink()
+            df.to_parquet(cache_path, compression='zstd')
+        except OSError:
+            pass  # Read-only deployments just skip the disk cache
+
         return df
 
     except Exception as e:
         st.error(f"💥 Critical Error: {e}")
         return pd.DataFrame()
 
+# Per-unit totals only change when the data does, so cache them alongside it
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_unit_totals(version):
+    return unit_totals(load_data(version))
+
+# The inspector's rows as an Arrow table, built once per data load
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_inspector_table(version):
+    rows = load_data(version).nlargest(INSPECTOR_ROWS, 'mwh_volume')
+    return pa.Table.from_pandas(rows[['timeFrom', 'bmUnitId', 'levelFrom', 'levelTo', 'mwh_volume']], preserve_index=False)
+
+# Map points (locations + seeded jitter), built once per data load
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_map_points(version):
+    map_df = load_unit_totals(version).to_frame().join(_locations_df(), how='inner').reset_index()
+    jitter = np.random.default_rng(MAP_JITTER_SEED).uniform(-0.02, 0.02, size=(len(map_df), 2))
+    map_df['lat'] += jitter[:, 0]
+    map_df['lon'] += jitter[:, 1]
+    map_df['size'] = map_df['mwh_volume'].to_numpy() / 10
+    return map_df
+
 # --- SIDEBAR ---
 with st.sidebar:
     st.title("⚡ Supplementary Info")
@@ -220,13 +280,49 @@ with tab_sources:
     * [LCP: Zonal Pricing Savings Analysis](https://www.lcp.com/en/insights/publications/zonal-pricing-in-great-britain)
     """)
 
+# --- VISUALS ---
+# Each visual is its own fragment. None of them holds a widget (an expander
+# never triggers a rerun), so for now this is only structure: every rerun
+# still redraws all three, from inputs cached per data load. A widget added
+# inside one later would rerun just that block.
+@st.fragment
+def _render_top10(totals):
+    st.subheader("📊 Top 10 Curtailed Assets")
+    top_assets = totals.nlargest(10).reset_index()
+    # Imported here so a cold start doesn't pay for plotly before the
+    # page has painted; after the first run it's just a sys.modules lookup
+    import plotly.express as px
+    fig = px.bar(top_assets, x='mwh_volume', y='bmUnitId', orientation='h',
+                 color='mwh_volume', color_continuous_scale='Reds')
+    fig.update_layout(yaxis={'categoryorder':'total ascending'}, height=400)
+    st.plotly_chart(fig, use_container_width=True)
+
+@st.fragment
+def _render_map(map_df):
+    st.subheader("🗺️ Geographic Grid Saturation")
+    if not map_df.empty:
+        st.map(map_df, latitude='lat', longitude='lon', size='size', zoom=4.5)
+        st.caption("Dots represent physical locations of curtailed wind farms (B6 Boundary emphasis). Note that the Scottish farms are huge, so several assets may be clustered due to proximity and aren't individually distinguishable in the map.")
+
+@st.fragment
+def _render_inspector(table, total_rows):
+    with st.expander("💾 Raw Grid Telemetry Inspector"):
+        # Only the largest instructions are sent to the browser
+        if total_rows > table.num_rows:
+            st.caption(f"Showing the {table.num_rows:,} largest of {total_rows:,} instructions.")
+        st.dataframe(table,
+                     column_config={'mwh_volume': st.column_config.NumberColumn(format='%.2f')},
+                     hide_index=True)
+
 # --- MAIN DATA SECTION ---
-df = load_data()
+version = data_version()
+df = load_data(version)
 
 if not df.empty:
     total_mwh = abs(df['mwh_volume'].sum())
     total_cost = total_mwh * 70 
-    active_units = df['bmUnitId'].nunique()
+    # The loader trims bmUnitId's categories to the units present, so no hashing pass
+    active_units = len(df['bmUnitId'].cat.categories)
 
     st.divider()
     col1, col2, col3 = st.columns(3)
@@ -238,34 +334,12 @@ if not df.empty:
 
     # --- VISUALS ---
     col_left, col_right = st.columns([1, 1])
-
     with col_left:
-        st.subheader("📊 Top 10 Curtailed Assets")
-        top_assets = df.groupby('bmUnitId')['mwh_volume'].sum().abs().sort_values(ascending=False).head(10).reset_index()
-        fig = px.bar(top_assets, x='mwh_volume', y='bmUnitId', orientation='h',
-                     color='mwh_volume', color_continuous_scale='Reds')
-        fig.update_layout(yaxis={'categoryorder':'total ascending'}, height=400)
-        st.plotly_chart(fig, use_container_width=True)
-
+        _render_top10(load_unit_totals(version))
     with col_right:
-        st.subheader("🗺️ Geographic Grid Saturation")
-        map_data = []
-        grouped = df.groupby('bmUnitId')['mwh_volume'].sum().abs().reset_index()
-        for index, row in grouped.iterrows():
-            uid = row['bmUnitId']
-            if uid in ASSET_LOCATIONS:
-                loc = ASSET_LOCATIONS[uid]
-                map_data.append({
-                    'lat': loc['lat'] + np.random.uniform(-0.02, 0.02),
-                    'lon': loc['lon'] + np.random.uniform(-0.02, 0.02),
-                    'name': loc['name'], 'size': row['mwh_volume'] / 10 
-                })
-        if map_data:
-            st.map(pd.DataFrame(map_data), latitude='lat', longitude='lon', size='size', zoom=4.5)
-            st.caption("Dots represent physical locations of curtailed wind farms (B6 Boundary emphasis). Note that the Scottish farms are huge, so several assets may be clustered due to proximity and aren't individually distinguishable in the map.")
-    
-    with st.expander("💾 Raw Grid Telemetry Inspector"):
-        st.dataframe(df[['timeFrom', 'bmUnitId', 'levelFrom', 'levelTo', 'mwh_volume']].sort_values('mwh_volume', ascending=False))
+        _render_map(load_map_points(version))
+
+    _render_inspector(load_inspector_table(version), len(df))
 
 else:
     st.error("No data found. Ensure 'raw_acceptances.csv' exists.")
\ No newline at end of file
@@ -1,67 +1,134 @@
 import requests
 import pandas as pd
+import pyarrow as pa
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    # Optional: parses the period payloads several times faster than json
+    import orjson
+except ImportError:
+    orjson = None
+
+from calculate_physics import convert_to_parquet
+
+# The periods are independent and the loop is pure network wait, so fetch
+# several at once over a pooled session instead of 48 back-to-back requests
+MAX_WORKERS = 8
+
+# Column types of the bid-offer fields we know about. Any other field the API
+# returns is kept with Arrow's inferred type. Timestamps stay as the API's ISO
+# strings; calculate_physics parses them.
+BID_OFFER_SCHEMA = pa.schema([
+    ('settlementDate', pa.string()),
+    ('settlementPeriod', pa.int64()),
+    ('nationalGridBmUnit', pa.string()),
+    ('bmUnit', pa.string()),
+    ('timeFrom', pa.string()),
+    ('timeTo', pa.string()),
+    ('levelFrom', pa.float32()),
+    ('levelTo', pa.float32()),
+    ('bid', pa.float64()),
+    ('offer', pa.float64()),
+    ('pairId', pa.int64()),
+])
+
+def rows_to_frame(rows):
+    # pa.array merges the keys of every row, so no returned field is dropped
+    try:
+        table = pa.Table.from_struct_array(pa.array(rows))
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        # A field with mixed types: let pandas keep it as object
+        print(f"   ⚠️ Mixed field types ({e}), building the frame with pandas")
+        return pd.DataFrame(rows)
+
+    for field in BID_OFFER_SCHEMA:
+        if field.name in table.column_names:
+            i = table.schema.get_field_index(field.name)
+            try:
+                table = table.set_column(i, field, table.column(i).cast(field.type))
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                print(f"   ⚠️ Column {field.name} isn't {field.type}, keeping it as {table.schema.field(i).type}")
+    return table.to_pandas()
 
 def fetch_bid_offer_data(date="2024-01-24"):
     print(f"🚀 Fetching Bid-Offer Data for {date}...")
-    
+
     # This is the standard "Bid Offer" endpoint from the portal
     # It often requires looping by settlement period to return data
     url = "https://data.elexon.co.uk/bmrs/api/v1/balancing/bid-offer/all"
-    
-    all_data = []
-    
+
     # We loop because 'all' endpoints rarely allow full-day dumps without an API key or specific permissions
     # 48 Settlement Periods in a day
-    print("   Looping through 48 periods (Standard API requirement)...")
-    
-    for period in range(1, 49):
-        params = {
-            "settlementDate": date,
-            "settlementPeriod": period,
-            "format": "json"
-        }
-        
-        try:
-            # We add headers to ensure we aren't blocked as a 'bot'
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+    print(f"   Fetching 48 periods ({MAX_WORKERS} at a time)...")
+
+    with requests.Session() as session:
+        # We add headers to ensure we aren't blocked as a 'bot'
+        session.headers.update({
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+        })
+        # Keep-alive connections, with backoff on rate limits / server errors
+        retry = Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+        session.mount("https://", HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS, max_retries=retry))
+
+        def fetch_period(period):
+            params = {
+                "settlementDate": date,
+                "settlementPeriod": period,
+                "format": "json"
             }
-            
-            r = requests.get(url, params=params, headers=headers, timeout=10)
-            
-            if r.status_code == 200:
-                data = r.json().get('data', [])
-                all_data.extend(data)
-                # Feedback every 10 periods so you know it's working
-                if period % 10 == 0:
-                    print(f"   ✅ Period {period}: Got {len(data)} records")
-            else:
-                print(f"   ❌ Period {period}: Failed ({r.status_code})")
-                
-        except Exception as e:
-            print(f"   ⚠️ Error period {period}: {e}")
+
+            try:
+                r = session.get(url, params=params, timeout=10)
+
+                if r.status_code == 200:
+                    payload = orjson.loads(r.content) if orjson is not None else r.json()
+                    data = payload.get('data', [])
+                    # Feedback every 10 periods so you know it's working
+                    if period % 10 == 0:
+                        print(f"   ✅ Period {period}: Got {len(data)} records")
+                    return data
+                else:
+                    print(f"   ❌ Period {period}: Failed ({r.status_code})")
+
+            except Exception as e:
+                print(f"   ⚠️ Error period {period}: {e}")
+
+            return []
+
+        # map() keeps the results in settlement-period order
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            pages = list(executor.map(fetch_period, range(1, 49)))
+
+    all_data = [row for page in pages for row in page]
 
     if not all_data:
         print("❌ Total Failure: No data returned. Check internet or API status.")
         return pd.DataFrame()
 
-    df = pd.DataFrame(all_data)
+    df = rows_to_frame(all_data)
     print(f"\n🎉 SUCCESS! Fetched {len(df)} rows.")
-    
+
     # RENAME for consistency with our Logic Script
     # The API likely returns 'bmUnit' -> we need 'bmUnitId'
     if 'bmUnit' in df.columns:
         df.rename(columns={'bmUnit': 'bmUnitId'}, inplace=True)
-        
+
     # Save
     df.to_csv("data/raw/raw_acceptances.csv", index=False)
     print("💾 Saved to data/raw/raw_acceptances.csv")
-    
+
+    # Typed Parquet copy for the physics/dashboard loaders, so their first
+    # run doesn't have to parse the CSV
+    convert_to_parquet("data/raw/raw_acceptances.csv", "data/raw/raw_acceptances.parquet")
+    print("💾 Saved to data/raw/raw_acceptances.parquet")
+
     return df
 
 if __name__ == "__main__":
     df = fetch_bid_offer_data()
-    
+
     if not df.empty:
         print("\n--- COLUMNS RECEIVED ---")
         print(list(df.columns))
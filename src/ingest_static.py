@@ -1,21 +1,129 @@
+import functools
+from pathlib import Path
+
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 
-def load_wind_ids():
-    # UPDATED: Using read_excel for .xlsx files
-    # Make sure the file in your folder is actually named "BMUFuelType.xlsx"
-    df = pd.read_excel("data/static/BMUFuelType.xlsx")
+try:
+    # Optional: without it the register is read through pandas + openpyxl
+    from python_calamine import CalamineWorkbook
+except ImportError:
+    CalamineWorkbook = None
 
-    # Filter for Wind using the EXACT column names
-    # We use .strip() just in case there are hidden spaces in the headers
-    df.columns = [c.strip() for c in df.columns]
+STATIC_DIR = Path(__file__).resolve().parent.parent / "data" / "static"
+EXCEL_PATH = STATIC_DIR / "BMUFuelType.xlsx"
+PARQUET_PATH = STATIC_DIR / "BMUFuelType.parquet"
+REGISTER_COLUMNS = ['BMRS FUEL TYPE', 'NESO BMU ID', 'SETT UNIT ID']
 
-    wind_df = df[df['BMRS FUEL TYPE'] == 'WIND']
+def check_register_columns(columns, path):
+    # Checked once, at conversion time; the Parquet copy has the canonical names
+    missing = [c for c in REGISTER_COLUMNS if c not in columns]
+    if missing:
+        raise KeyError(f"{path} is missing register columns {missing}")
 
-    # Create a set of IDs for fast lookup
-    wind_ids = set(wind_df['NESO BMU ID'].unique())
+def _cell_text(value):
+    # Cells as text, like pandas' dtype="string" (blank -> null, 1234.0 -> '1234')
+    if value == '':
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
 
-    print(f"✅ Loaded {len(wind_ids)} Wind Units.")
+def read_register(path):
+    # Returns the register columns as an Arrow table of strings
+    if CalamineWorkbook is None:
+        return _read_register_openpyxl(path)
+
+    # python-calamine parses in Rust; keep only our 3 cells of each row
+    rows = CalamineWorkbook.from_path(path).get_sheet_by_index(0).iter_rows()
+    # We use .strip() just in case there are hidden spaces in the headers.
+    header = [str(c).strip() for c in next(rows)]
+    check_register_columns(header, path)
+    positions = [header.index(name) for name in REGISTER_COLUMNS]
+
+    columns = [[] for _ in REGISTER_COLUMNS]
+    for row in rows:
+        for values, i in zip(columns, positions):
+            values.append(_cell_text(row[i]))
+    return pa.table({name: pa.array(values, pa.string()) for name, values in zip(REGISTER_COLUMNS, columns)})
+
+def _read_register_openpyxl(path):
+    # Fallback: only the register columns, as text, in openpyxl's streaming mode
+    usecols = lambda c: c.strip() in REGISTER_COLUMNS
+    static_df = pd.read_excel(path, engine="openpyxl", usecols=usecols, dtype="string",
+                              engine_kwargs={"read_only": True, "data_only": True})
+    static_df.columns = [c.strip() for c in static_df.columns]
+    check_register_columns(static_df.columns, path)
+    return pa.Table.from_pandas(static_df[REGISTER_COLUMNS], preserve_index=False)
+
+def source_key(path):
+    # Identifies one version of a source file: mtime alone can go backwards
+    # (e.g. a git checkout), the size catches most of those cases
+    stat = Path(path).stat()
+    return f"{stat.st_mtime_ns}_{stat.st_size}".encode()
+
+def cached_source_key(parquet_path=PARQUET_PATH):
+    # Stored in the Parquet footer, so this reads a few KB, not the data
+    try:
+        return (pq.read_schema(parquet_path).metadata or {}).get(b'source')
+    except (OSError, pa.ArrowInvalid):
+        return None
+
+def write_register_copy(table, excel_path=EXCEL_PATH, parquet_path=PARQUET_PATH):
+    # Tagged with the version of the xlsx it was built from
+    metadata = {**(table.schema.metadata or {}), b'source': source_key(excel_path)}
+    pq.write_table(table.replace_schema_metadata(metadata), parquet_path)
+
+def convert_register(excel_path=EXCEL_PATH, parquet_path=PARQUET_PATH):
+    write_register_copy(read_register(excel_path), excel_path, parquet_path)
+
+def register_version():
+    # Cache key for the wind IDs, so an updated xlsx is picked up without a restart
+    return source_key(EXCEL_PATH) if EXCEL_PATH.exists() else None
+
+def load_wind_ids():
+    return _load_wind_ids(register_version())
+
+@functools.lru_cache(maxsize=1)
+def _load_wind_ids(version):
+    # 1. Convert the .xlsx to Parquet once per version of the file
+    if version is not None and cached_source_key() != version:
+        table = read_register(EXCEL_PATH)
+        dataset = ds.dataset(table)
+        try:
+            write_register_copy(table)
+        except OSError:
+            pass  # Read-only deployments just filter the parsed register in memory
+    else:
+        # Fuel type as a dictionary column: the WIND filter compares codes
+        parquet_format = ds.ParquetFileFormat(read_options=ds.ParquetReadOptions(dictionary_columns=['BMRS FUEL TYPE']))
+        dataset = ds.dataset(PARQUET_PATH, format=parquet_format)
+
+    # 2. Filter for Wind inside the scan (using the EXACT column names)
+    wind_table = dataset.to_table(columns=['NESO BMU ID', 'SETT UNIT ID'], filter=ds.field('BMRS FUEL TYPE') == 'WIND')
+
+    # 3. The API might use 'NESO BMU ID' or 'SETT UNIT ID', so load BOTH
+    ids = pa.chunked_array(wind_table.column('NESO BMU ID').chunks + wind_table.column('SETT UNIT ID').chunks)
+    wind_ids = frozenset(pc.unique(ids).drop_null().to_pylist())
     return wind_ids
 
+def load_wind_id_array():
+    return _load_wind_id_array(register_version())
+
+@functools.lru_cache(maxsize=1)
+def _load_wind_id_array(version):
+    # The same IDs as an Arrow array, for pc.is_in / dataset isin() filters
+    return pa.array(sorted(_load_wind_ids(version)), pa.string())
+
 if __name__ == "__main__":
-    load_wind_ids()
\ No newline at end of file
+    # Prepare step: (re)build the Parquet copy so the first dashboard load
+    # doesn't have to parse the xlsx
+    if EXCEL_PATH.exists():
+        convert_register()
+        print(f"💾 Saved to {PARQUET_PATH}")
+
+    wind_ids = load_wind_ids()
+    print(f"✅ Loaded {len(wind_ids)} Wind Units.")
@@ -1,21 +1,46 @@
-import requests
+import json
+
 import pandas as pd
+import urllib3
+
+try:
+    # Optional: lets us stop parsing after the first record
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# One keep-alive connection pool for the module, asking for compressed JSON
+HTTP = urllib3.PoolManager(maxsize=4, headers={"Accept-Encoding": "gzip, deflate"})
 
 def inspect_api_columns():
     # Fetch just ONE row to see the structure
     url = "https://data.elexon.co.uk/bmrs/api/v1/balancing/acceptances/all"
     params = {"settlementDate": "2024-01-24", "format": "json"}
-    
+
     try:
-        response = requests.get(url, params=params, timeout=10)
-        data = response.json()['data']
-        
-        if data:
+        response = HTTP.request("GET", url, fields=params, timeout=10, preload_content=False)
+        try:
+            if ijson is not None:
+                # Only the first record is needed, so stop parsing there
+                first = next(ijson.items(response, 'data.item'), None)
+            else:
+                body = response.read()
+                data = (orjson.loads(body) if orjson is not None else json.loads(body))['data']
+                first = data[0] if data else None
+        finally:
+            response.release_conn()
+
+        if first:
             print("\n🔍 ACTUAL API COLUMNS:")
-            print(list(data[0].keys()))  # Print the keys of the first item
+            print(list(first.keys()))  # Print the keys of the first item
         else:
             print("❌ No data returned.")
-            
+
     except Exception as e:
         print(f"❌ Error: {e}")
 